@@ -4,11 +4,24 @@ import logging
 import threading
 import queue
 import time
+import tempfile
+import sys
 
 from dotmap import DotMap
 
 logger = logging.getLogger(__name__)
 
+def _sizeof(obj) -> int:
+    """
+    Returns the in-memory size (in bytes) of a parsed PDS result, including everything it contains.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_sizeof(key) + _sizeof(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_sizeof(item) for item in obj)
+    return size
+
 class People:
     """
     A class for interacting with the Harvard Person Data Service (PDS) API.
@@ -27,6 +40,7 @@ class People:
     - total_count (int): The total number of results available for the last API call.
     - paginate (bool): Whether or not to paginate results.
     - session_id (str): The ID of the current pagination session.
+    - max_memory (int): The estimated in-memory size (in bytes) of a result above which `plan` will not hold it in memory.
     """
 
     def __init__(self, apikey, batch_size=50, retries=3, session_timeout: int=3, environment='prod'):
@@ -51,6 +65,7 @@ class People:
         self.pagination_type = 'queue' 
         self.result_queue = queue.Queue()
         self.max_backlog = 5000
+        self.max_memory = 256 * 1024 * 1024
         self.results = []
 
         self.count = 0
@@ -402,6 +417,227 @@ class People:
                 # just hang out for 10 seconds
                 time.sleep(10)
 
+    def plan(self, query:str='', strategy:str=None, sample_size:int=10) -> dict:
+        """
+        Runs a cheap pre-flight search to size a query and picks a strategy for fetching it.
+
+        The pre-flight asks PDS for `sample_size` records (no pagination session is created)
+        to get the `total_count` and the average in-memory size of a parsed record, which is
+        used to estimate how much memory the full result would take.
+
+        Strategies:
+        - `single`: everything fits in one batch, so a single `search` call is made.
+        - `list`: the estimated result fits in `max_memory`, so everything is paginated into `results` as fast as possible.
+        - `queue`: the payload is too big to hold, so batches are paginated into `result_queue` as they are consumed.
+        - `spill`: even a `max_backlog` worth of records won't fit in `max_memory`, so batches are paginated to a temporary file.
+
+        Args:
+        - query (str): The query to search for.
+        - strategy (str): Forces a strategy (`single`, `list`, `queue` or `spill`) instead of picking one. `single` is only allowed if the result fits in one batch.
+        - sample_size (int): The number of records to fetch in the pre-flight. Defaults to 10.
+
+        Returns:
+        - A dictionary describing the plan, to be passed to `execute`.
+        """
+        if self.apikey is None:
+            raise Exception("Error: apikey required")
+
+        headers = {
+            "Content-Type": "application/json",
+            "x-api-key": self.apikey
+        }
 
+        params = {
+            "size": min(sample_size, self.batch_size)
+        }
 
+        response = self.pds_request(self.pds_url, headers, params, query)
+        try:
+            response = response.json()
+        except AttributeError as ar:
+            raise Exception(f"Error: pre-flight failed for query: {query}")
+
+        total_count = response['total_count']
+        sample = response['results']
+        record_bytes = 0
+        if len(sample) > 0:
+            record_bytes = sum(_sizeof(record) for record in sample) // len(sample)
+        estimated_bytes = record_bytes * total_count
+
+        if strategy is None:
+            if total_count <= self.batch_size:
+                strategy = 'single'
+            elif estimated_bytes <= self.max_memory:
+                strategy = 'list'
+            elif self.max_backlog is None or record_bytes * self.max_backlog > self.max_memory:
+                strategy = 'spill'
+            else:
+                strategy = 'queue'
+        elif strategy not in ('single', 'list', 'queue', 'spill'):
+            raise ValueError(f"Invalid strategy: ({strategy})")
+        elif strategy == 'single' and total_count > self.batch_size:
+            raise ValueError(f"Invalid strategy: (single) can't fetch {total_count} records with a batch_size of {self.batch_size}")
+
+        pages = -(-total_count // self.batch_size)
+        logger.debug(f"Planned {strategy} for {total_count} records in {pages} pages (~{estimated_bytes} bytes)")
+
+        return {
+            'query': query,
+            'strategy': strategy,
+            'total_count': total_count,
+            'pages': pages,
+            'record_bytes': record_bytes,
+            'estimated_bytes': estimated_bytes,
+        }
+
+    def execute(self, plan:dict, progress=None):
+        """
+        Runs a plan made by `plan`, yielding batches of results regardless of the strategy.
+
+        Progress is logged (and passed to `progress` if given) as a dictionary with
+        `fetched`, `total_count`, `elapsed` and `eta` (both in seconds) keys. It's reported
+        once for `single`, after every page is fetched for `queue` and `spill`, and once a
+        second while fetching (plus once when done) for `list`, which is all fetched before
+        any batches are yielded.
+
+        Only one execute can run at a time. If a `queue` execute is abandoned before it's
+        exhausted, its pagination session keeps running in the background and another
+        execute will be refused until it finishes.
+
+        If fewer records are fetched than PDS reported (e.g. pagination failed partway),
+        an exception is raised once the records that were fetched have been yielded.
+
+        Args:
+        - plan (dict): The plan returned by `plan`.
+        - progress (callable): An optional function that is called with the progress.
 
+        Returns:
+        - A generator of lists of results.
+        """
+        strategy = plan['strategy']
+        query = plan['query']
+        total_count = plan['total_count']
+        start_time = time.time()
+        fetched = 0
+
+        if strategy not in ('single', 'list', 'queue', 'spill'):
+            raise ValueError(f"Invalid strategy: ({strategy})")
+
+        # an abandoned execute leaves its thread paginating against this instance's session and queue
+        if self.pagination_thread and self.pagination_thread.is_alive():
+            raise Exception("Error: a previous pagination is still running")
+
+        if strategy == 'single':
+            response = self.search(query)
+            if 'results' not in response:
+                raise Exception(f"Error: search failed for query: {query}")
+            results = response['results']
+            self.report_progress(len(results), total_count, start_time, progress)
+            yield results
+            self.check_shortfall(len(results))
+            return
+
+        self.results = []
+        self.result_queue = queue.Queue()
+        self.pagination_thread = None
+        max_backlog = self.max_backlog
+        pagination_type = self.pagination_type
+        try:
+            if strategy in ('list', 'spill'):
+                self.max_backlog = None
+
+            try:
+                self.start_pagination(query, type='list' if strategy == 'list' else 'queue')
+            except KeyError as ke:
+                raise Exception(f"Error: search failed for query: {query}")
+
+            if strategy == 'list':
+                while self.pagination_thread and self.pagination_thread.is_alive():
+                    self.report_progress(len(self.results), total_count, start_time, progress)
+                    self.pagination_thread.join(timeout=1)
+                fetched = len(self.results)
+                self.report_progress(fetched, total_count, start_time, progress)
+                while len(self.results) > 0:
+                    yield self.next_page_results()
+
+            elif strategy == 'queue':
+                for results in self.drain_queue():
+                    fetched += len(results)
+                    self.report_progress(fetched, total_count, start_time, progress)
+                    yield results
+
+            elif strategy == 'spill':
+                # pull everything to disk as fast as it comes so a slow consumer can't time out the session
+                with tempfile.TemporaryFile(mode='w+') as spill:
+                    for results in self.drain_queue():
+                        spill.write(json.dumps(results) + "\n")
+                        fetched += len(results)
+                        self.report_progress(fetched, total_count, start_time, progress)
+                    spill.seek(0)
+                    for line in spill:
+                        yield json.loads(line)
+        finally:
+            self.max_backlog = max_backlog
+            # an abandoned queue execute's thread still reads pagination_type, so leave it until it's done
+            if not (self.pagination_thread and self.pagination_thread.is_alive()):
+                self.pagination_type = pagination_type
+
+        self.check_shortfall(fetched)
+
+    def check_shortfall(self, fetched:int):
+        """
+        Raises an exception if fewer records were fetched than PDS reported for the query.
+
+        It's not expected for this to be called directly outside of execute.
+
+        Args:
+        - fetched (int): The number of records fetched.
+        """
+        if fetched < self.total_count:
+            logger.error(f"Only fetched {fetched} of {self.total_count} records for query: {self.last_query}")
+            raise Exception(f"Error: only fetched {fetched} of {self.total_count} records from PDS")
+
+    def drain_queue(self):
+        """
+        Yields batches from the result queue until pagination has finished and the queue is empty.
+
+        It's not expected for this to be called directly outside of execute.
+        """
+        while True:
+            try:
+                results = self.result_queue.get(timeout=1)
+                self.result_queue.task_done()
+                yield results
+            except queue.Empty:
+                if self.pagination_thread is None or not self.pagination_thread.is_alive():
+                    if self.result_queue.empty():
+                        break
+
+    def report_progress(self, fetched:int, total_count:int, start_time:float, progress=None) -> dict:
+        """
+        Logs the progress of an `execute` call and passes it on to the `progress` callback.
+
+        Args:
+        - fetched (int): The number of records fetched so far.
+        - total_count (int): The total number of records expected.
+        - start_time (float): When the execution started.
+        - progress (callable): An optional function to call with the progress.
+
+        Returns:
+        - A dictionary with the `fetched`, `total_count`, `elapsed` and `eta` of the execution.
+        """
+        elapsed = time.time() - start_time
+        eta = None
+        if fetched > 0:
+            eta = max(total_count - fetched, 0) * elapsed / fetched
+
+        status = {
+            'fetched': fetched,
+            'total_count': total_count,
+            'elapsed': elapsed,
+            'eta': eta,
+        }
+        logger.debug(f"Fetched {fetched}/{total_count} records in {elapsed:.0f}s (eta: {'unknown' if eta is None else f'{eta:.0f}s'})")
+        if progress:
+            progress(status)
+        return status
@@ -0,0 +1,220 @@
+import unittest
+from unittest.mock import patch, Mock, MagicMock
+import pds
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        self.query = {'query': 'example'}  # Example JSON structure for parameters
+        self.pds = pds.People(apikey="an api key", batch_size=10)
+
+    def mock_preflight(self, total_count):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            'results': [{'univid': '12345678'}],
+            'count': 1,
+            'total_count': total_count
+        }
+        return mock_response
+
+    @patch('pds.requests.post')
+    def test_plan_single(self, mock_search):
+        mock_search.return_value = self.mock_preflight(5)
+
+        plan = self.pds.plan(self.query)
+
+        self.assertEqual(plan['strategy'], 'single')
+        self.assertEqual(plan['total_count'], 5)
+        self.assertEqual(plan['pages'], 1)
+
+        # the pre-flight should not open a pagination session
+        self.assertNotIn('paginate', mock_search.call_args.kwargs['params'])
+
+    @patch('pds.requests.post')
+    def test_plan_list(self, mock_search):
+        mock_search.return_value = self.mock_preflight(25)
+
+        plan = self.pds.plan(self.query)
+
+        self.assertEqual(plan['strategy'], 'list')
+        self.assertEqual(plan['pages'], 3)
+        self.assertEqual(plan['estimated_bytes'], plan['record_bytes'] * 25)
+
+    @patch('pds.requests.post')
+    def test_plan_queue(self, mock_search):
+        mock_search.return_value = self.mock_preflight(200000)
+        self.pds.max_memory = 10 * 1024 * 1024
+
+        plan = self.pds.plan(self.query)
+
+        self.assertEqual(plan['strategy'], 'queue')
+
+    @patch('pds.requests.post')
+    def test_plan_spill(self, mock_search):
+        mock_search.return_value = self.mock_preflight(200000)
+        self.pds.max_memory = 1024
+
+        plan = self.pds.plan(self.query)
+
+        self.assertEqual(plan['strategy'], 'spill')
+
+    @patch('pds.requests.post')
+    def test_plan_list_accounts_for_memory_overhead(self, mock_search):
+        mock_search.return_value = self.mock_preflight(25)
+
+        plan = self.pds.plan(self.query)
+
+        # a parsed record takes more memory than its JSON text
+        self.assertGreater(plan['record_bytes'], len('{"univid": "12345678"}'))
+
+    @patch('pds.requests.post')
+    def test_plan_single_too_many_records(self, mock_search):
+        mock_search.return_value = self.mock_preflight(25)
+
+        with self.assertRaises(ValueError):
+            self.pds.plan(self.query, strategy='single')
+
+    @patch('pds.requests.post')
+    def test_plan_invalid_strategy(self, mock_search):
+        mock_search.return_value = self.mock_preflight(5)
+
+        with self.assertRaises(ValueError):
+            self.pds.plan(self.query, strategy='invalid')
+
+
+class TestExecute(unittest.TestCase):
+    def setUp(self):
+        self.query = {'query': 'example'}  # Example JSON structure for parameters
+        self.pds = pds.People(apikey="an api key", batch_size=3)
+
+    def make_plan(self, strategy, total_count):
+        return {
+            'query': self.query,
+            'strategy': strategy,
+            'total_count': total_count,
+            'pages': -(-total_count // 3),
+            'record_bytes': 1,
+            'estimated_bytes': total_count
+        }
+
+    def mock_page(self, results, total_count, status_code=200):
+        mock_response = Mock()
+        mock_response.status_code = status_code
+        mock_response.json.return_value = {
+            'results': results,
+            'count': len(results),
+            'total_count': total_count,
+            'session_id': "somesessionid"
+        }
+        return mock_response
+
+    def mock_pages(self, total_count):
+        records = [{'univid': str(i)} for i in range(total_count)]
+        return [self.mock_page(records[i:i + 3], total_count) for i in range(0, total_count, 3)]
+
+    @patch('pds.pds.time.sleep')
+    @patch('pds.requests.post')
+    def test_execute_single(self, mock_search, mock_sleep):
+        mock_search.side_effect = self.mock_pages(2)
+        progress = MagicMock()
+
+        batches = list(self.pds.execute(self.make_plan('single', 2), progress=progress))
+
+        self.assertEqual(batches, [[{'univid': '0'}, {'univid': '1'}]])
+        status = progress.call_args.args[0]
+        self.assertEqual(status['fetched'], 2)
+        self.assertEqual(status['eta'], 0)
+
+    @patch('pds.pds.time.sleep')
+    @patch('pds.requests.post')
+    def test_execute_single_failure(self, mock_search, mock_sleep):
+        mock_search.return_value = self.mock_page([], 0, status_code=401)
+
+        with self.assertRaisesRegex(Exception, "search failed"):
+            list(self.pds.execute(self.make_plan('single', 2)))
+
+    @patch('pds.pds.time.sleep')
+    @patch('pds.requests.post')
+    def test_execute_list(self, mock_search, mock_sleep):
+        mock_search.side_effect = self.mock_pages(10)
+        progress = MagicMock()
+
+        batches = list(self.pds.execute(self.make_plan('list', 10), progress=progress))
+
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 3, 1])
+        self.assertEqual(batches[-1], [{'univid': '9'}])
+        self.assertEqual(progress.call_args.args[0]['fetched'], 10)
+        self.assertEqual(self.pds.max_backlog, 5000)
+        self.assertEqual(self.pds.pagination_type, 'queue')
+
+    @patch('pds.pds.time.sleep')
+    @patch('pds.requests.post')
+    def test_execute_queue(self, mock_search, mock_sleep):
+        mock_search.side_effect = self.mock_pages(10)
+        progress = MagicMock()
+
+        batches = list(self.pds.execute(self.make_plan('queue', 10), progress=progress))
+
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 3, 1])
+        self.assertEqual(progress.call_count, 4)
+        self.assertEqual(progress.call_args.args[0]['fetched'], 10)
+        self.assertTrue(self.pds.result_queue.empty())
+
+    @patch('pds.pds.time.sleep')
+    @patch('pds.requests.post')
+    def test_execute_spill(self, mock_search, mock_sleep):
+        mock_search.side_effect = self.mock_pages(10)
+
+        batches = list(self.pds.execute(self.make_plan('spill', 10)))
+
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 3, 1])
+        self.assertEqual(batches[0], [{'univid': '0'}, {'univid': '1'}, {'univid': '2'}])
+        self.assertEqual(self.pds.max_backlog, 5000)
+
+    @patch('pds.pds.time.sleep')
+    @patch('pds.requests.post')
+    def test_execute_pagination_failure(self, mock_search, mock_sleep):
+        failure = self.mock_page([], 10, status_code=401)
+
+        for strategy in ('list', 'queue', 'spill'):
+            with self.subTest(strategy=strategy):
+                # the third page fails on every retry
+                mock_search.side_effect = self.mock_pages(10)[:2] + [failure] * self.pds.retries
+
+                batches = []
+                with self.assertRaisesRegex(Exception, "only fetched 6 of 10"):
+                    for batch in self.pds.execute(self.make_plan(strategy, 10)):
+                        batches.append(batch)
+
+                # what was fetched is still handed over before the failure is raised
+                self.assertEqual(sum(len(batch) for batch in batches), 6)
+
+    @patch('pds.pds.time.sleep')
+    @patch('pds.requests.post')
+    def test_execute_first_page_failure(self, mock_search, mock_sleep):
+        mock_search.return_value = self.mock_page([], 0, status_code=401)
+
+        for strategy in ('list', 'queue', 'spill'):
+            with self.subTest(strategy=strategy):
+                with self.assertRaisesRegex(Exception, "search failed"):
+                    list(self.pds.execute(self.make_plan(strategy, 10)))
+
+    def test_execute_previous_pagination_running(self):
+        self.pds.pagination_thread = Mock()
+        self.pds.pagination_thread.is_alive.return_value = True
+        self.pds.search = MagicMock()
+
+        for strategy in ('single', 'list', 'queue', 'spill'):
+            with self.subTest(strategy=strategy):
+                with self.assertRaisesRegex(Exception, "still running"):
+                    list(self.pds.execute(self.make_plan(strategy, 10)))
+
+        self.pds.search.assert_not_called()
+
+    def test_execute_invalid_strategy(self):
+        with self.assertRaises(ValueError):
+            list(self.pds.execute(self.make_plan('invalid', 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()